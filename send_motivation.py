@@ -1,142 +1,402 @@
 #!/usr/bin/env python3
 """Daily motivation email sender for habit breaking."""
 
+import base64
+import http.client
+import io
 import json
 import os
 import random
 import smtplib
+import sys
+import threading
+import time
 import urllib.error
-import urllib.request
-from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from email.header import Header
+from email.utils import formataddr, parseaddr
+from functools import lru_cache, wraps
 from pathlib import Path
+from urllib.parse import urlsplit
+
+# Sent with every API request; gzip keeps the JSON payloads small on the wire
+DEFAULT_HEADERS = {"User-Agent": "DailyMotivation/1.0", "Accept-Encoding": "gzip"}
+
+# Idle keep-alive HTTPS connections per host. A connection is checked out
+# for one request at a time, so concurrent requests never share a socket.
+POOL_MAXSIZE = 4
+_idle_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _checkout_connection(host, timeout):
+    """Take an idle pooled connection for a host, or open a new one."""
+    with _connections_lock:
+        idle = _idle_connections.get(host)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        return http.client.HTTPSConnection(host, timeout=timeout)
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+
+def _release_connection(host, conn):
+    """Return a connection to the pool, closing it if the pool is full."""
+    with _connections_lock:
+        idle = _idle_connections.setdefault(host, [])
+        if len(idle) < POOL_MAXSIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def _read_limited(response, max_bytes):
+    """Read a response body, raising ValueError if it is over max_bytes."""
+    length = response.getheader("Content-Length")
+    if length is not None and int(length) > max_bytes:
+        raise ValueError(f"Response of {length} bytes exceeds the {max_bytes} byte limit")
+    data = b""
+    while len(data) <= max_bytes:
+        chunk = response.read(max_bytes + 1 - len(data))
+        if not chunk:
+            return data
+        data += chunk
+    raise ValueError(f"Response exceeds the {max_bytes} byte limit")
+
+
+def _gunzip_limited(data, max_bytes):
+    """Decompress a gzip body, raising ValueError if it inflates past max_bytes."""
+    inflated = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, max_bytes + 1)
+    if len(inflated) > max_bytes:
+        raise ValueError(f"Decompressed response exceeds the {max_bytes} byte limit")
+    return inflated
+
+
+def https_request(method, url, headers=None, body=None, timeout=10, max_bytes=65536):
+    """Send an HTTPS request over a pooled keep-alive connection.
+
+    Returns the response body as bytes, refusing bodies over max_bytes.
+    Non-2xx responses raise urllib.error.HTTPError, matching what urlopen
+    would do.
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    conn = _checkout_connection(parts.netloc, timeout)
+    try:
+        conn.request(method, path, body=body, headers={**DEFAULT_HEADERS, **(headers or {})})
+        response = conn.getresponse()
+        data = _read_limited(response, max_bytes)
+    except Exception:
+        # Never reuse a connection left mid-request
+        conn.close()
+        raise
+    _release_connection(parts.netloc, conn)
+    if response.getheader("Content-Encoding", "").lower() == "gzip":
+        data = _gunzip_limited(data, max_bytes)
+    if not 200 <= response.status < 300:
+        raise urllib.error.HTTPError(
+            url, response.status, response.reason, response.headers, io.BytesIO(data)
+        )
+    return data
+
+
+TRANSIENT_HTTP_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def _is_transient(error):
+    """Return True for errors worth retrying: throttling, 5xx and network failures."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in TRANSIENT_HTTP_CODES
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def _retry(fn, *, attempts=3, base=0.5):
+    """Call fn, retrying transient errors with exponential backoff and jitter."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_transient(e):
+                raise
+            delay = base * 2 ** attempt + random.uniform(0, base)
+            print(f"Transient error ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+BREAKER_STATE_PATH = Path(__file__).parent / ".breaker_state.json"
+_breaker_lock = threading.Lock()
 
 
+def _load_breaker_state():
+    """Load per-endpoint breaker state, treating a missing or bad file as empty."""
+    try:
+        return json.loads(BREAKER_STATE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_breaker_result(endpoint, succeeded, threshold):
+    """Update the failure count for an endpoint and open it at the threshold."""
+    with _breaker_lock:
+        state = _load_breaker_state()
+        if succeeded:
+            if state.pop(endpoint, None) is None:
+                return
+        else:
+            entry = state.setdefault(endpoint, {"failures": 0, "opened_at": None})
+            entry["failures"] += 1
+            if entry["failures"] >= threshold:
+                entry["opened_at"] = time.time()
+        # The breaker must never change what the wrapped call returns or raises
+        try:
+            with open(BREAKER_STATE_PATH, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+        except OSError as e:
+            print(f"Could not save circuit breaker state ({e})")
+
+
+# Each endpoint is called once per daily run, so count failures across
+# days and stay open long enough to skip the next scheduled run
+BREAKER_THRESHOLD = 3
+BREAKER_RESET_AFTER = 36 * 3600
+
+
+def breaker(endpoint, threshold=5, reset_after=3600):
+    """Fail fast with CircuitOpenError while an endpoint keeps failing.
+
+    After `threshold` consecutive failures the endpoint is skipped for
+    `reset_after` seconds, then one trial call is let through. State is
+    kept in BREAKER_STATE_PATH, which the workflow carries from one run
+    to the next with actions/cache.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _breaker_lock:
+                entry = _load_breaker_state().get(endpoint, {})
+            opened_at = entry.get("opened_at")
+            if opened_at is not None and time.time() - opened_at < reset_after:
+                raise CircuitOpenError(f"{endpoint} circuit is open, skipping request")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                _record_breaker_result(endpoint, False, threshold)
+                raise
+            _record_breaker_result(endpoint, True, threshold)
+            return result
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=1)
 def load_quotes():
-    """Load quotes from the JSON file."""
+    """Load quotes from the JSON file, parsed once per process.
+
+    Returns parallel (texts, categories) tuples; tuples because the cached
+    value is shared by every caller.
+    """
     quotes_path = Path(__file__).parent / "quotes.json"
-    with open(quotes_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    raw = json.loads(quotes_path.read_bytes())
+    texts = tuple(q["text"] for q in raw)
+    # Interned so CATEGORY_LABELS lookups hit the identity fast path
+    categories = tuple(sys.intern(q["category"]) for q in raw)
+    return texts, categories
 
 
 def get_random_quote(quotes):
     """Select a random quote from local collection."""
-    quote = random.choice(quotes)
-    return quote["text"], quote["category"]
+    texts, categories = quotes
+    i = random.randrange(len(texts))
+    return texts[i], categories[i]
 
 
-def fetch_api_quote():
+ZEN_CACHE_PATH = Path(__file__).parent / ".zen_cache.json"
+
+
+@breaker("zenquotes", threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET_AFTER)
+def _fetch_zenquotes():
     """Fetch a random quote from ZenQuotes API."""
     url = "https://zenquotes.io/api/random"
-    req = urllib.request.Request(url, headers={"User-Agent": "DailyMotivation/1.0"})
-    with urllib.request.urlopen(req, timeout=10) as response:
-        data = json.loads(response.read().decode())
-        quote_text = data[0]["q"]
-        author = data[0]["a"]
-        return f"{quote_text} - {author}", "api"
+    raw = _retry(lambda: https_request("GET", url, timeout=10))
+    data = json.loads(raw)
+    quote_text = data[0]["q"]
+    author = data[0]["a"]
+    return f"{quote_text} - {author}"
+
 
+def fetch_api_quote():
+    """Return today's ZenQuotes quote, only calling the API once per day."""
+    today = date.today().isoformat()
+    try:
+        cache = json.loads(ZEN_CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get("date") == today:
+        return cache["quote"], "api"
 
-def load_quote_history():
-    """Load previous Claude quotes from history file."""
-    history_path = Path(__file__).parent / "quote_history.json"
-    if history_path.exists():
-        with open(history_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    quote = _fetch_zenquotes()
+    try:
+        ZEN_CACHE_PATH.write_bytes(json.dumps({"date": today, "quote": quote}).encode("utf-8"))
+    except OSError as e:
+        print(f"Could not cache ZenQuotes quote ({e})")
+    return quote, "api"
+
+
+HISTORY_PATH = Path(__file__).parent / "quote_history.jsonl"
+
+
+def load_quote_history(count=5, window=8192):
+    """Load the most recent Claude quotes, reading only the tail of the history file."""
+    if not HISTORY_PATH.exists():
+        return []
+    with open(HISTORY_PATH, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        # Grow the window until it holds `count` complete records or the whole file
+        while True:
+            start = max(0, end - window)
+            f.seek(start)
+            tail = f.read()
+            if start == 0 or tail.count(b"\n") > count:
+                break
+            window *= 2
+    lines = tail.splitlines()
+    # Seeking into the middle of the file usually lands inside a record
+    if start > 0:
+        lines = lines[1:]
+    history = []
+    for line in lines:
+        try:
+            history.append(json.loads(line))
+        except ValueError:
+            # Blank, or torn by an interrupted append
+            continue
+    return history[-count:]
 
 
 def save_quote_to_history(quote):
-    """Save a new quote to the history file."""
-    history_path = Path(__file__).parent / "quote_history.json"
-    history = load_quote_history()
-    history.append({
+    """Append a new quote to the history file."""
+    record = {
         "text": quote,
         "date": datetime.now().strftime("%Y-%m-%d")
-    })
-    # Keep only the last 30 quotes to prevent file from growing too large
-    history = history[-30:]
-    with open(history_path, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=2)
+    }
+    with open(HISTORY_PATH, "ab") as f:
+        f.write(json.dumps(record).encode("utf-8") + b"\n")
+    # Trim once a week rather than rewriting the whole file on every save.
+    # Trimming is housekeeping, so it must not cost the caller its quote.
+    if datetime.now().weekday() == 0:
+        try:
+            trim_quote_history()
+        except OSError as e:
+            print(f"Could not trim quote history ({e})")
+
+
+def trim_quote_history(keep=30):
+    """Keep only the last `keep` quotes to prevent the file from growing too large."""
+    lines = [line for line in HISTORY_PATH.read_bytes().splitlines() if line.strip()]
+    if len(lines) <= keep:
+        return
+    # Write a temporary file and swap it in, so a crash mid-write never
+    # leaves the history truncated
+    tmp_path = HISTORY_PATH.with_name(HISTORY_PATH.name + ".tmp")
+    try:
+        tmp_path.write_bytes(b"\n".join(lines[-keep:]) + b"\n")
+        os.replace(tmp_path, HISTORY_PATH)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+BASE_PROMPT = (
+    "Generate a short, original message about overcoming addiction and recovery. "
+    "Keep the tone plain-spoken, honest, and grounded - like advice from someone who's been there. "
+    "Avoid flowery or poetic language. Be direct and practical. "
+    "It can be a few sentences long. "
+    "Different angles are fine: showing up on hard days, building new habits, dealing with setbacks, "
+    "asking for help, or just getting through today. "
+    "Return ONLY the message text itself, nothing else - no attribution, no quotation marks, "
+    "no explanation."
+)
+
+VARIETY_PROMPT = (
+    "\n\nFor variety, here are the most recent messages that were sent. "
+    "Please create something with a different tone, theme, or perspective:\n"
+)
+
+# The request body only varies in the prompt, so the JSON around it is fixed
+CLAUDE_BODY_PREFIX = (
+    b'{"model":"claude-sonnet-4-20250514","max_tokens":300,'
+    b'"messages":[{"role":"user","content":'
+)
+CLAUDE_BODY_SUFFIX = b"}]}"
+
+
+@breaker("claude", threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET_AFTER)
+def _post_claude(request_body, headers):
+    """Send a Messages API request to Claude and return the raw response body."""
+    url = "https://api.anthropic.com/v1/messages"
+    return _retry(lambda: https_request("POST", url, headers=headers, body=request_body, timeout=15))
 
 
 def fetch_claude_quote():
     """Generate an inspirational addiction recovery quote using Claude API."""
     api_key = os.environ["ANTHROPIC_API_KEY"]
-    url = "https://api.anthropic.com/v1/messages"
 
     # Load recent quotes to provide context for variety
     history = load_quote_history()
     recent_quotes = [q["text"] for q in history[-5:]]
 
-    prompt = (
-        "Generate a short, original message about overcoming addiction and recovery. "
-        "Keep the tone plain-spoken, honest, and grounded - like advice from someone who's been there. "
-        "Avoid flowery or poetic language. Be direct and practical. "
-        "It can be a few sentences long. "
-        "Different angles are fine: showing up on hard days, building new habits, dealing with setbacks, "
-        "asking for help, or just getting through today. "
-        "Return ONLY the message text itself, nothing else - no attribution, no quotation marks, "
-        "no explanation."
-    )
-
+    parts = [BASE_PROMPT]
     if recent_quotes:
-        prompt += (
-            "\n\nFor variety, here are the most recent messages that were sent. "
-            "Please create something with a different tone, theme, or perspective:\n"
-        )
-        for i, q in enumerate(recent_quotes, 1):
-            prompt += f"\n{i}. \"{q}\""
-
-    request_body = json.dumps({
-        "model": "claude-sonnet-4-20250514",
-        "max_tokens": 300,
-        "messages": [{"role": "user", "content": prompt}]
-    }).encode("utf-8")
-
-    req = urllib.request.Request(
-        url,
-        data=request_body,
-        headers={
-            "Content-Type": "application/json",
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01"
-        }
-    )
+        parts.append(VARIETY_PROMPT)
+        parts.extend(f'\n{i}. "{q}"' for i, q in enumerate(recent_quotes, 1))
+    prompt = "".join(parts)
+
+    request_body = CLAUDE_BODY_PREFIX + json.dumps(prompt).encode("utf-8") + CLAUDE_BODY_SUFFIX
+
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01"
+    }
 
     try:
-        with urllib.request.urlopen(req, timeout=15) as response:
-            data = json.loads(response.read().decode())
-            quote_text = data["content"][0]["text"].strip()
-            # Save the new quote to history for future reference
-            save_quote_to_history(quote_text)
-            return quote_text
+        raw = _post_claude(request_body, headers)
     except urllib.error.HTTPError as e:
         error_body = e.read().decode()
         print(f"Claude API error {e.code}: {error_body}")
         raise
 
+    data = json.loads(raw)
+    quote_text = data["content"][0]["text"].strip()
+    # Save the new quote to history for future reference
+    save_quote_to_history(quote_text)
+    return quote_text
+
+
+START_DATE = datetime.strptime(os.environ.get("START_DATE", "2025-01-15"), "%Y-%m-%d").date()
+
 
 def calculate_days_since_start():
     """Calculate days since the journey started."""
-    start_date_str = os.environ.get("START_DATE", "2025-01-15")
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-    today = datetime.now()
-    return (today - start_date).days
+    return (date.today() - START_DATE).days
 
 
-def create_email_body(local_quote, local_category, api_quote, claude_quote, days):
-    """Create the email body with all three quotes and progress."""
-    category_labels = {
-        "general": "Daily Motivation",
-        "smoking": "Smoke-Free Journey",
-        "alcohol": "Sobriety Strength",
-        "gaming": "Real Life Focus"
-    }
+CATEGORY_LABELS = {
+    "general": "Daily Motivation",
+    "smoking": "Smoke-Free Journey",
+    "alcohol": "Sobriety Strength",
+    "gaming": "Real Life Focus"
+}
 
-    local_label = category_labels.get(local_category, "Daily Motivation")
 
-    body = f"""
+EMAIL_TEMPLATE = """\
 Good morning!
 
 Day {days} of your journey to a better life.
@@ -163,51 +423,130 @@ Recovery Insight:
 
 You're doing great. Every day counts. Keep going!
 
-- Your Daily Motivation App
-"""
-    return body.strip()
+- Your Daily Motivation App"""
 
 
-def send_email(subject, body):
-    """Send the email via Gmail SMTP."""
-    gmail_address = os.environ["GMAIL_ADDRESS"]
-    gmail_password = os.environ["GMAIL_APP_PASSWORD"]
-    recipient = os.environ["EMAIL_RECIPIENT"]
-
-    msg = MIMEMultipart()
-    msg["From"] = gmail_address
-    msg["To"] = recipient
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
+def create_email_body(local_quote, local_category, api_quote, claude_quote, days):
+    """Create the email body with all three quotes and progress."""
+    local_label = CATEGORY_LABELS.get(local_category, "Daily Motivation")
+    return EMAIL_TEMPLATE.format(
+        days=days,
+        local_label=local_label,
+        local_quote=local_quote,
+        api_quote=api_quote,
+        claude_quote=claude_quote
+    )
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(gmail_address, gmail_password)
-        server.sendmail(gmail_address, recipient, msg.as_string())
 
-    print(f"Email sent successfully to {recipient}")
+def _encode_address(value):
+    """RFC 2047-encode a non-ASCII display name; the address itself must be ASCII."""
+    if value.isascii():
+        return value
+    return formataddr(parseaddr(value), charset="utf-8")
+
+
+def build_message(sender, recipient, subject, body):
+    """Build a single-part plain-text email as raw RFC 5322 bytes."""
+    if not subject.isascii():
+        subject = Header(subject, "utf-8").encode(linesep="\r\n")
+    headers = (
+        f"From: {_encode_address(sender)}\r\n"
+        f"To: {_encode_address(recipient)}\r\n"
+        f"Subject: {subject}\r\n"
+        "MIME-Version: 1.0\r\n"
+        "Content-Type: text/plain; charset=utf-8\r\n"
+        "Content-Transfer-Encoding: base64\r\n"
+        "\r\n"
+    )
+    # base64 keeps lines under the SMTP limit however long a quote is
+    text = body.replace("\n", "\r\n").encode("utf-8")
+    payload = base64.encodebytes(text).replace(b"\n", b"\r\n")
+    return headers.encode("ascii") + payload
+
+
+class SmtpSender:
+    """Gmail SMTP session that logs in once and can send several emails."""
+
+    def __init__(self):
+        self.gmail_address = os.environ["GMAIL_ADDRESS"]
+        self.gmail_password = os.environ["GMAIL_APP_PASSWORD"]
+        self.recipient = os.environ["EMAIL_RECIPIENT"]
+        self.server = None
+
+    def connect(self):
+        """Open the TLS connection and log in, unless already connected."""
+        if self.server is None:
+            server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
+            try:
+                server.login(self.gmail_address, self.gmail_password)
+            except Exception:
+                server.close()
+                raise
+            self.server = server
+        return self
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Quit the session if one is open."""
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except smtplib.SMTPServerDisconnected:
+            pass
+        finally:
+            self.server.close()
+            self.server = None
+
+    def send(self, subject, body, recipient=None):
+        """Send one email over the open session, by default to EMAIL_RECIPIENT."""
+        recipient = recipient or self.recipient
+        msg = build_message(self.gmail_address, recipient, subject, body)
+        self.server.sendmail(self.gmail_address, recipient, msg)
+        print(f"Email sent successfully to {recipient}")
 
 
 def main():
-    local_quotes = load_quotes()
-    local_quote, local_category = get_random_quote(local_quotes)
-    days = calculate_days_since_start()
-
-    try:
-        api_quote, _ = fetch_api_quote()
-    except Exception as e:
-        print(f"ZenQuotes API fetch failed ({e}), using second local quote")
-        api_quote, _ = get_random_quote(local_quotes)
+    sender = SmtpSender()
 
+    # Closed in finally so a failure anywhere below never leaks the
+    # session that the worker may already have logged in
     try:
-        claude_quote = fetch_claude_quote()
-    except Exception as e:
-        print(f"Claude API fetch failed ({e}), using fallback quote")
-        claude_quote = "Every step forward, no matter how small, is a victory worth celebrating."
-
-    subject = f"Day {days}: Your Daily Motivation"
-    body = create_email_body(local_quote, local_category, api_quote, claude_quote, days)
-
-    send_email(subject, body)
+        # The API calls and the SMTP handshake are independent network waits,
+        # so overlap them and log in to Gmail while the quotes are fetched
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            smtp_future = executor.submit(sender.connect)
+            api_future = executor.submit(fetch_api_quote)
+            claude_future = executor.submit(fetch_claude_quote)
+
+            local_quotes = load_quotes()
+            local_quote, local_category = get_random_quote(local_quotes)
+            days = calculate_days_since_start()
+
+        try:
+            api_quote, _ = api_future.result()
+        except Exception as e:
+            print(f"ZenQuotes API fetch failed ({e}), using second local quote")
+            api_quote, _ = get_random_quote(local_quotes)
+
+        try:
+            claude_quote = claude_future.result()
+        except Exception as e:
+            print(f"Claude API fetch failed ({e}), using fallback quote")
+            claude_quote = "Every step forward, no matter how small, is a victory worth celebrating."
+
+        subject = f"Day {days}: Your Daily Motivation"
+        body = create_email_body(local_quote, local_category, api_quote, claude_quote, days)
+
+        smtp_future.result()
+        sender.send(subject, body)
+    finally:
+        sender.close()
 
 
 if __name__ == "__main__":